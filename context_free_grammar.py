@@ -1,4 +1,9 @@
 import re
+import sys
+from typing import Optional
+
+# Pattern a left-hand side variable has to match
+_LHS_RE = re.compile(r'[A-Z]\d*\Z')
 
 
 class InvalidRule(Exception):
@@ -24,9 +29,20 @@ class ContextFreeGrammar:
         """
         self.variables = set(variables)  # Store variables as a set
         self.terminals = set(terminals)  # Store terminals as a set
-        self.rules = rules  # Store production rules
+        # Store production rules, with each product as a tuple of interned symbols
+        self.rules = {variable: [tuple(map(sys.intern, product)) for product in products]
+                      for variable, products in rules.items()}
         self.start_variable = start_variable  # Store start variable
 
+        # Index of the products of each variable for constant-time lookups
+        self._product_index = {variable: set(products) for variable, products in self.rules.items()}
+
+        # Reverse index from a single-product body to the variables producing exactly it
+        self._rhs_to_lhs: dict[tuple[tuple[str, ...], ...], dict[str, None]] = {}
+        self._lhs_to_rhs: dict[str, tuple[tuple[str, ...], ...]] = {}
+        for variable in self.rules:
+            self._index_rhs(variable)
+
         # Sort rules with the start variable at the beginning
         self.sort_rules()
 
@@ -34,60 +50,155 @@ class ContextFreeGrammar:
         """
         Sort the production rules to ensure the start variable's rules come first.
         """
-        new_rules = {self.start_variable: self.rules[self.start_variable]}
-        for variable, products in self.rules.items():
-            if variable != self.start_variable:
-                new_rules[variable] = products.copy()
+        # Nothing to do if the start variable already comes first
+        if next(iter(self.rules)) == self.start_variable:
+            return
+
+        # Move the start variable to the front, reusing the existing product lists
+        self.rules = {self.start_variable: self.rules.pop(self.start_variable), **self.rules}
+
+    def _index_rhs(self, variable: str):
+        """
+        Update the reverse index after the products of a variable have changed.
+
+        Parameters:
+        variable (str): The variable whose products have changed.
+        """
+        old_rhs = self._lhs_to_rhs.pop(variable, None)
+        if old_rhs is not None:
+            owners = self._rhs_to_lhs[old_rhs]
+            del owners[variable]
+            if not owners:
+                del self._rhs_to_lhs[old_rhs]
+
+        # Only single-product bodies are ever looked up
+        products = self.rules[variable]
+        if len(products) == 1:
+            rhs = (products[0],)
+            self._lhs_to_rhs[variable] = rhs
+            self._rhs_to_lhs.setdefault(rhs, {})[variable] = None
+
+    def find_variable(self, rhs: list[tuple[str, ...]]) -> Optional[str]:
+        """
+        Find a variable whose products are exactly the given single product.
 
-        # Update the rules with the sorted rules
-        self.rules = new_rules
+        Parameters:
+        rhs (list[tuple[str, ...]]): The products to look for.
+
+        Returns:
+        Optional[str]: The variable producing exactly rhs, or None if there is none.
+        """
+        owners = self._rhs_to_lhs.get(tuple(rhs))
+        return next(iter(owners)) if owners else None
+
+    def has_product(self, variable: str, product: tuple[str, ...]) -> bool:
+        """
+        Check whether a variable has a given product.
+
+        Parameters:
+        variable (str): The variable to check.
+        product (tuple[str, ...]): The product to look for.
+
+        Returns:
+        bool: True if the variable has the product, False otherwise.
+        """
+        return tuple(product) in self._product_index.get(variable, ())
 
-    def add_product(self, variable: str, product: list[str]):
+    def add_product(self, variable: str, product: tuple[str, ...]):
         """
         Add a new product (production rule) to a variable.
 
         Parameters:
         variable (str): The variable to which the product is added.
-        product (list[str]): The product to add.
+        product (tuple[str, ...]): The product to add.
         """
         # Ensure the variable is in the set of variables
         self.variables.add(variable)
 
+        product = tuple(product)
+
         if variable in self.rules.keys():
             # Append the product if it doesn't exist
-            if product not in self.rules[variable]:
+            if product not in self._product_index[variable]:
                 self.rules[variable].append(product)
+                self._product_index[variable].add(product)
+                self._index_rhs(variable)
         else:
             # Create a new entry if the variable doesn't exist
             self.rules[variable] = [product]
+            self._product_index[variable] = {product}
+            self._index_rhs(variable)
+
+    def remove_product(self, variable: str, product: tuple[str, ...]):
+        """
+        Remove a product (production rule) from a variable.
+
+        Parameters:
+        variable (str): The variable from which the product is removed.
+        product (tuple[str, ...]): The product to remove.
+        """
+        product = tuple(product)
+        self.rules[variable].remove(product)
+        self._product_index[variable].discard(product)
+        self._index_rhs(variable)
+
+    def set_products(self, variable: str, products: list[tuple[str, ...]]):
+        """
+        Replace all products of a variable, dropping duplicates while keeping order.
+
+        Parameters:
+        variable (str): The variable whose products are replaced.
+        products (list[tuple[str, ...]]): The new products.
+        """
+        self.variables.add(variable)
 
-    def add_rule(self, lhs: str, rhs: list[list[str]]):
+        unique_products = dict.fromkeys(tuple(product) for product in products)
+        self.rules[variable] = list(unique_products)
+        self._product_index[variable] = set(unique_products)
+        self._index_rhs(variable)
+
+    def add_rule(self, lhs: str, rhs: list[tuple[str, ...]], fresh: bool = False):
         """
         Add a new rule to the grammar.
 
         Parameters:
         lhs (str): The left-hand side variable of the rule.
-        rhs (list[list[str]]): The right-hand side productions of the rule.
+        rhs (list[tuple[str, ...]]): The right-hand side productions of the rule.
+        fresh (bool): Store rhs as the products of a still undefined lhs without
+                      checking it for duplicates, which the caller has to rule out.
 
         Raises:
-        InvalidRule: If the left-hand side does not match the required pattern.
+        InvalidRule: If the left-hand side does not match the required pattern,
+                     or if fresh is set and the left-hand side is already defined.
         """
         # Ensure lhs is in the correct format
-        if not re.match(r'[A-Z]\d*$', lhs):
+        if not _LHS_RE.match(lhs):
+            raise InvalidRule
+
+        # Never overwrite the products of an existing variable
+        if fresh and lhs in self.rules:
             raise InvalidRule
 
         for rhs_item in rhs:
             for item in rhs_item:
-                if item.isupper() and item not in self.variables:
-                    # Add new variable if it is not present
+                if item.isupper():
+                    # Add new variable, sets ignore ones already present
                     self.variables.add(item)
-
-                if item.islower() or item == 'ε':
-                    # Add new terminal if it is not present
+                elif item.islower() or item == 'ε':
+                    # Add new terminal, sets ignore ones already present
                     self.terminals.add(item)
 
-            # Add the right-hand side product
-            self.add_product(lhs, rhs_item)
+            if not fresh:
+                # Add the right-hand side product
+                self.add_product(lhs, rhs_item)
+
+        if fresh:
+            # Store the right-hand side products as they are
+            products = [tuple(rhs_item) for rhs_item in rhs]
+            self.variables.add(lhs)
+            self.rules[lhs] = products
+            self._product_index[lhs] = set(products)
+            self._index_rhs(lhs)
 
     def __repr__(self):
         """
@@ -96,12 +207,6 @@ class ContextFreeGrammar:
         Returns:
         str: The string representation of the grammar.
         """
-        s = []
-        for variable, product in self.rules.items():
-            right_hand_side = [''.join(item) for item in product]
-
-            # Format each rule
-            s.append(f"{variable} → {'|'.join(right_hand_side)}")
-
-        # Join all rules with newline characters
-        return '\n'.join(s)
+        # Format each rule and join all rules with newline characters
+        return '\n'.join(f"{variable} → " + '|'.join(''.join(item) for item in product)
+                         for variable, product in self.rules.items())
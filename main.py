@@ -1,58 +1,148 @@
+import sys
+from collections import deque
+
 from context_free_grammar import ContextFreeGrammar
-from itertools import product
 
 
-def generate_combinations(item: list[str], variable: str) -> list[list[str]]:
+def _expand_k1(item: tuple[str, ...], indices: list[int]) -> list[tuple[str, ...]]:
     """
-    Generate all combinations of a list where a specific variable can be replaced
-    by None or kept as is.
+    Generate all combinations of a tuple where the single item at the given
+    index can be dropped or kept as is, without looping over masks.
 
     Parameters:
-    item (list): The list containing the items to be combined.
-    variable (str): The variable to be replaced by None.
+    item (tuple): The tuple containing the items to be combined.
+    indices (list[int]): The index of the item that can be dropped.
 
     Returns:
-    list: A list of lists with all possible combinations where the variable is
-          either None or retained.
+    list: A list of tuples with both combinations, in the same order as
+          generate_combinations.
     """
-    # Find indices of the variable in the list
-    indices = [i for i, x in enumerate(item) if x == variable]
+    i0 = indices[0]
+    s0, s1 = item[:i0], item[i0 + 1:]
+    x0 = item[i0:i0 + 1]
+    return [s0 + s1, s0 + x0 + s1]
 
-    # Generate all binary combinations for the indices
-    combinations = product([0, 1], repeat=len(indices))
 
-    results = []
-    for combination in combinations:
-        new_list = item[:]
-        for idx, include in zip(indices, combination):
-            if not include:
-                # Replace with None based on the combination
-                new_list[idx] = None
+def _expand_k2(item: tuple[str, ...], indices: list[int]) -> list[tuple[str, ...]]:
+    """
+    Generate all combinations of a tuple where each of exactly two items at the
+    given indices can be dropped or kept as is, without looping over masks.
 
-        # Remove None elements
-        result = [x for x in new_list if x is not None]
+    Parameters:
+    item (tuple): The tuple containing the items to be combined.
+    indices (list[int]): The two indices of the items that can be dropped.
 
-        # If result is empty, add epsilon ('ε')
-        results.append(result if result else ['ε'])
+    Returns:
+    list: A list of tuples with all 4 combinations, in the same order as
+          generate_combinations.
+    """
+    i0, i1 = indices
+    s0, s1, s2 = item[:i0], item[i0 + 1:i1], item[i1 + 1:]
+    x0, x1 = item[i0:i0 + 1], item[i1:i1 + 1]
+    return [s0 + s1 + s2, s0 + x0 + s1 + s2, s0 + s1 + x1 + s2, s0 + x0 + s1 + x1 + s2]
 
-    return results
 
+def _expand_k3(item: tuple[str, ...], indices: list[int]) -> list[tuple[str, ...]]:
+    """
+    Generate all combinations of a tuple where each of exactly three items at the
+    given indices can be dropped or kept as is, without looping over masks.
+
+    Parameters:
+    item (tuple): The tuple containing the items to be combined.
+    indices (list[int]): The three indices of the items that can be dropped.
 
-def replace_products(grammar: ContextFreeGrammar, variable: str, products: list[list[str]]):
+    Returns:
+    list: A list of tuples with all 8 combinations, in the same order as
+          generate_combinations.
     """
-    Replace the products of a given variable in the grammar with new products.
+    i0, i1, i2 = indices
+    s0, s1, s2, s3 = item[:i0], item[i0 + 1:i1], item[i1 + 1:i2], item[i2 + 1:]
+    x0, x1, x2 = item[i0:i0 + 1], item[i1:i1 + 1], item[i2:i2 + 1]
+    return [
+        s0 + s1 + s2 + s3,
+        s0 + x0 + s1 + s2 + s3,
+        s0 + s1 + x1 + s2 + s3,
+        s0 + x0 + s1 + x1 + s2 + s3,
+        s0 + s1 + s2 + x2 + s3,
+        s0 + x0 + s1 + s2 + x2 + s3,
+        s0 + s1 + x1 + s2 + x2 + s3,
+        s0 + x0 + s1 + x1 + s2 + x2 + s3,
+    ]
+
+
+def _expand_k4(item: tuple[str, ...], indices: list[int]) -> list[tuple[str, ...]]:
+    """
+    Generate all combinations of a tuple where each of exactly four items at the
+    given indices can be dropped or kept as is, without looping over masks.
 
     Parameters:
-    grammar (ContextFreeGrammar): The grammar object.
-    variable (str): The variable whose products are to be replaced.
-    products (list[list[str]]): The new products to replace the old ones.
+    item (tuple): The tuple containing the items to be combined.
+    indices (list[int]): The four indices of the items that can be dropped.
+
+    Returns:
+    list: A list of tuples with all 16 combinations, in the same order as
+          generate_combinations.
+    """
+    i0, i1, i2, i3 = indices
+    s0, s1, s2, s3, s4 = item[:i0], item[i0 + 1:i1], item[i1 + 1:i2], item[i2 + 1:i3], item[i3 + 1:]
+    x0, x1, x2, x3 = item[i0:i0 + 1], item[i1:i1 + 1], item[i2:i2 + 1], item[i3:i3 + 1]
+    return [
+        s0 + s1 + s2 + s3 + s4,
+        s0 + x0 + s1 + s2 + s3 + s4,
+        s0 + s1 + x1 + s2 + s3 + s4,
+        s0 + x0 + s1 + x1 + s2 + s3 + s4,
+        s0 + s1 + s2 + x2 + s3 + s4,
+        s0 + x0 + s1 + s2 + x2 + s3 + s4,
+        s0 + s1 + x1 + s2 + x2 + s3 + s4,
+        s0 + x0 + s1 + x1 + s2 + x2 + s3 + s4,
+        s0 + s1 + s2 + s3 + x3 + s4,
+        s0 + x0 + s1 + s2 + s3 + x3 + s4,
+        s0 + s1 + x1 + s2 + s3 + x3 + s4,
+        s0 + x0 + s1 + x1 + s2 + s3 + x3 + s4,
+        s0 + s1 + s2 + x2 + s3 + x3 + s4,
+        s0 + x0 + s1 + s2 + x2 + s3 + x3 + s4,
+        s0 + s1 + x1 + s2 + x2 + s3 + x3 + s4,
+        s0 + x0 + s1 + x1 + s2 + x2 + s3 + x3 + s4,
+    ]
+
+
+# Unrolled expansions indexed by the number of droppable items minus one
+_EXPANSIONS = (_expand_k1, _expand_k2, _expand_k3, _expand_k4)
+
+
+def generate_combinations(item: tuple[str, ...], indices: list[int]) -> list[tuple[str, ...]]:
     """
-    # Clear existing products
-    grammar.rules[variable].clear()
+    Generate all combinations of a list where the items at the given indices can
+    be dropped or kept as is.
+
+    Parameters:
+    item (tuple): The tuple containing the items to be combined.
+    indices (list[int]): The indices of the items that can be dropped.
+
+    Returns:
+    list: A list of tuples with all possible combinations where each item at the
+          given indices is either dropped or retained.
+    """
+    if 0 < len(indices) <= len(_EXPANSIONS):
+        results = _EXPANSIONS[len(indices) - 1](item, indices)
+
+        # Only dropping every item can leave the product empty
+        if not results[0]:
+            results[0] = ('ε',)
 
-    # Add new products
-    for product in products:
-        grammar.add_product(variable, product)
+        return results
+
+    results = []
+
+    # Each bit of the mask tells whether the item at the matching index is kept
+    for mask in range(1 << len(indices)):
+        dropped = {index for bit, index in enumerate(indices) if not mask >> bit & 1}
+        result = tuple(x for i, x in enumerate(item) if i not in dropped)
+
+        # If result is empty, add epsilon ('ε')
+        results.append(result if result else ('ε',))
+
+    return results
 
 
 def change_start_variable(grammar: ContextFreeGrammar):
@@ -66,9 +156,9 @@ def change_start_variable(grammar: ContextFreeGrammar):
         for product in products:
 
             # Check if the start variable is used in any production
-            if product == [grammar.start_variable]:
+            if product == (grammar.start_variable,):
                 # Add a new start rule
-                grammar.add_rule('S0', [[grammar.start_variable]])
+                grammar.add_rule('S0', [(grammar.start_variable,)])
 
                 # Change the start variable
                 grammar.start_variable = 'S0'
@@ -85,29 +175,31 @@ def remove_epsilon_rules(grammar: ContextFreeGrammar):
     Parameters:
     grammar (ContextFreeGrammar): The grammar object.
     """
-    visited = set()
-    nullable = {variable for variable, products in grammar.rules.items() if ['ε'] in products}
+    nullable = {variable for variable in grammar.rules if grammar.has_product(variable, ('ε',))}
 
-    while nullable:
-        variable = nullable.pop()
-        grammar.rules[variable].remove(['ε'])  # Remove epsilon rule
-        visited.add(variable)
+    # Find all nullable variables by propagating until nothing changes
+    changed = bool(nullable)
+    while changed:
+        changed = False
+        for variable, products in grammar.rules.items():
+            if variable not in nullable and any(all(x in nullable for x in product) for product in products):
+                nullable.add(variable)
+                changed = True
 
-        for var, pros in grammar.rules.items():
-            new_pros = []
-            for pro in pros:
-                if variable in pro:
-                    # Generate combinations without the variable
-                    new_pros.extend(generate_combinations(pro, variable))
+    for variable, products in grammar.rules.items():
+        new_products = []
+        for product in products:
+            if product != ('ε',):
+                indices = [i for i, x in enumerate(product) if x in nullable]
+                if not indices:
+                    new_products.append(product)
                 else:
-                    new_pros.append(pro)
+                    # Generate combinations without the nullable variables
+                    new_products.extend(item for item in generate_combinations(product, indices)
+                                        if item != ('ε',))
 
-            # Replace products with new ones
-            replace_products(grammar, var, new_pros)
-
-            # Add variable to nullable set if it has epsilon production
-            if ['ε'] in grammar.rules[var] and var not in visited:
-                nullable.add(var)
+        # Replace products with new ones, dropping epsilon rules
+        grammar.set_products(variable, new_products)
 
 
 def remove_unit_rules(grammar: ContextFreeGrammar):
@@ -117,17 +209,29 @@ def remove_unit_rules(grammar: ContextFreeGrammar):
     Parameters:
     grammar (ContextFreeGrammar): The grammar object.
     """
-    unit_pairs = [(variable, product) for variable, products in grammar.rules.items()
-                  for product in products if len(product) == 1 and product[0] in grammar.variables]
+    unit_pairs = deque((variable, product) for variable, products in grammar.rules.items()
+                       for product in products if len(product) == 1 and product[0] in grammar.variables)
+
+    processed_pairs: set[tuple[str, tuple[str, ...]]] = set()
+
+    while unit_pairs:
+        variable, product = unit_pairs.popleft()
+
+        # Remove unit production
+        grammar.remove_product(variable, product)
+        processed_pairs.add((variable, product))
 
-    for i, (variable, product) in enumerate(unit_pairs):
         if product[0] != variable:
-            # Remove unit production
-            grammar.rules[variable].remove(product)
+            # Add new products if they weren't removed before
+            new_products = [item for item in grammar.rules[product[0]]
+                            if (variable, item) not in processed_pairs]
+
+            # Queue unit productions the variable gains along the way
+            unit_pairs.extend((variable, item) for item in new_products
+                              if len(item) == 1 and item[0] in grammar.variables
+                              and not grammar.has_product(variable, item))
 
-            # Add new products if it wasn't removed before
-            if not any([(variable, item) in unit_pairs[:i] for item in grammar.rules[product[0]]]):
-                grammar.add_rule(variable, grammar.rules[product[0]])
+            grammar.add_rule(variable, new_products)
 
 
 def convert_to_proper_form(grammar: ContextFreeGrammar):
@@ -138,69 +242,55 @@ def convert_to_proper_form(grammar: ContextFreeGrammar):
     grammar (ContextFreeGrammar): The grammar object.
     """
     i = 1
-    index = 0
+    variables = deque(grammar.rules)
 
-    # Step 1: Ensure all productions have at most 2 variables
-    while index < len(grammar.rules.items()):
-        variable = list(grammar.rules.keys())[index]
-        products = grammar.rules[variable]
+    # Walk every product once, splitting long ones and then replacing their terminals
+    while variables:
+        variable = variables.popleft()
+        new_products = []
 
-        for product in products:
+        for product in list(grammar.rules[variable]):
             if len(product) >= 3:
-                grammar.rules[variable].remove(product)
-
-                new_variable = f'U{i}'
+                # Ensure all productions have at most 2 variables
                 new_product = [product[1:]]
 
-                for var, pros in grammar.rules.items():
-                    if new_product == pros:
-                        grammar.add_rule(variable, [[product[0], var]])
-                        break
-                else:
-                    grammar.add_rule(new_variable, new_product)
-                    grammar.add_rule(variable, [[product[0], new_variable]])
-                    i += 1
+                var = grammar.find_variable(new_product)
+                if var is None:
+                    # Skip names the grammar already uses
+                    while f'U{i}' in grammar.rules or f'U{i}' in grammar.variables:
+                        i += 1
 
-        index += 1
+                    var = f'U{i}'
+                    grammar.add_rule(var, new_product, fresh=True)
+                    variables.append(var)
+                    i += 1
 
-    index = 0
+                product = (product[0], var)
 
-    # Step 2: Ensure all terminals are only in unit productions
-    while index < len(grammar.rules.items()):
-        variable = list(grammar.rules.keys())[index]
-        products = grammar.rules[variable]
+            if len(product) == 2:
+                # Ensure all terminals are only in unit productions
+                new_product = []
+                for item in product:
+                    if item in grammar.terminals:
+                        var = grammar.find_variable([(item,)])
+                        if var is None:
+                            # Skip names the grammar already uses
+                            while f'U{i}' in grammar.rules or f'U{i}' in grammar.variables:
+                                i += 1
 
-        for j, product in enumerate(products):
-            if len(product) >= 2:
-                if product[0] in grammar.terminals:
-                    new_variable = f'U{i}'
-                    new_product = [[product[0]]]
+                            var = f'U{i}'
+                            grammar.add_rule(var, [(item,)], fresh=True)
+                            variables.append(var)
+                            i += 1
 
-                    for var, pros in grammar.rules.items():
-                        if new_product == pros:
-                            grammar.rules[variable][j] = [var, product[1]]
-                            break
-                    else:
-                        grammar.add_rule(new_variable, new_product)
-                        grammar.rules[variable][j] = [new_variable, product[1]]
-                        i += 1
+                        item = var
+                    new_product.append(item)
 
-                product = grammar.rules[variable][j]
+                product = tuple(new_product)
 
-                if product[1] in grammar.terminals:
-                    new_variable = f'U{i}'
-                    new_product = [[product[1]]]
-
-                    for var, pros in grammar.rules.items():
-                        if new_product == pros:
-                            grammar.rules[variable][j] = [product[0], var]
-                            break
-                    else:
-                        grammar.add_rule(new_variable, new_product)
-                        grammar.rules[variable][j] = [product[0], new_variable]
-                        i += 1
+            new_products.append(product)
 
-        index += 1
+        grammar.set_products(variable, new_products)
 
 
 def main(grammar: ContextFreeGrammar):
@@ -221,13 +311,22 @@ def main(grammar: ContextFreeGrammar):
 
 
 if __name__ == "__main__":
-    # Input grammar details from the user
-    variables = input("Enter the variables: ").split()
-    terminals = input("Enter the terminals: ").split()
-    rules = dict()
-    for variable in variables:
-        rules[variable] = list(map(list, input(f"Enter the products of {variable}: ").split()))
-    start_variable = input("Enter the start variable: ")
+    if sys.stdin.isatty():
+        # Input grammar details from the user
+        variables = input("Enter the variables: ").split()
+        terminals = input("Enter the terminals: ").split()
+        rules = dict()
+        for variable in variables:
+            rules[variable] = [tuple(product) for product in input(f"Enter the products of {variable}: ").split()]
+        start_variable = input("Enter the start variable: ")
+    else:
+        # Read redirected grammar details in one go, in the same order as the prompts
+        lines = sys.stdin.read().split('\n')
+        variables = lines[0].split()
+        terminals = lines[1].split()
+        rules = {variable: [tuple(product) for product in line.split()]
+                 for variable, line in zip(variables, lines[2:])}
+        start_variable = lines[2 + len(variables)].strip()
 
     # Create a grammar object
     grammar = ContextFreeGrammar(variables,